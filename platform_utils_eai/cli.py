@@ -0,0 +1,223 @@
+"""
+Command line entry point to run the functions of :mod:`platform_utils_eai.functions` over many datasets at once.
+
+Every subcommand takes one or more input datasets; with ``--jobs N`` they are processed by a pool of N worker
+processes. Heavy dependencies are only imported by the functions that need them, so short invocations start quickly.
+"""
+import argparse
+import json
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Optional
+
+from platform_utils_eai import functions
+
+
+def convert(input_path: Path, output_dir: Optional[Path], primary_key: str) -> str:
+    """
+    Convert a csv dataset to json with :func:`~platform_utils_eai.functions.make_json_from_csv`.
+
+    :return: path of the json file created
+    """
+    json_path = _convert_output_path(input_path, output_dir)
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+    functions.make_json_from_csv(input_path, json_path, primary_key)
+    return str(json_path)
+
+
+def normalize(input_path: Path, output_dir: Path, qmark_char: str) -> str:
+    """
+    Fix the encoding of a text file with :func:`~platform_utils_eai.functions.normalize_fucked_encoding`.
+
+    :return: path of the normalized file
+    """
+    output_path = _normalize_output_path(input_path, output_dir)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(input_path, encoding="utf-8") as f:
+        text = f.read()
+    with open(output_path, 'w', encoding="utf-8") as f:
+        f.write(functions.normalize_fucked_encoding(text, qmark_char))
+    return str(output_path)
+
+
+def _convert_output_path(input_path: Path, output_dir: Optional[Path]) -> Path:
+    output_dir = Path(output_dir) if output_dir else input_path.parent
+    return output_dir / f"{input_path.stem}.json"
+
+
+def _normalize_output_path(input_path: Path, output_dir: Path) -> Path:
+    return Path(output_dir) / input_path.name
+
+
+def _duplicate_outputs(output_paths: list) -> list:
+    """
+    Return the output paths that more than one input would write to.
+    """
+    seen = set()
+    duplicates = []
+    for output_path in output_paths:
+        resolved = Path(output_path).resolve()
+        if resolved in seen and output_path not in duplicates:
+            duplicates.append(output_path)
+        seen.add(resolved)
+    return duplicates
+
+
+def _create_run(input_path: Path, root_path: Path, text_key: str, id_key: Optional[str],
+                label_key: Optional[str]) -> dict:
+    """
+    Create a new run in `root_path` and fill it with the documents of a json dataset made by :func:`convert`.
+    """
+    with open(input_path, encoding="utf-8") as j:
+        data = json.load(j)
+
+    folders = functions.create_folder_structure(root_path)
+    for k, v in data.items():
+        filename = v[id_key] if id_key else k
+        annotations = [v[label_key]] if label_key and v.get(label_key) else []
+        functions.create_annotated_file(folders, filename, v[text_key], annotations)
+    return folders
+
+
+def build_tax(input_path: Path, root_path: Path, text_key: str, id_key: Optional[str], label_key: Optional[str],
+              publish_path: Optional[Path]) -> str:
+    """
+    Build the categorization libraries of a json dataset, optionally publishing them with
+    :func:`~platform_utils_eai.functions.publish_libraries`.
+
+    :return: path of the run folder, or of the published folder if `publish_path` is given
+    """
+    folders = _create_run(input_path, root_path, text_key, id_key, label_key)
+    functions.create_tax_library_zip(folders)
+    if publish_path:
+        return str(functions.publish_libraries(folders, publish_path))
+    return str(folders["tax_folder"].parent)
+
+
+def validate(input_path: Path) -> str:
+    """
+    Check a library zip with :func:`~platform_utils_eai.functions.validate_library_zip`.
+
+    :raises ValueError: if the library is not valid
+    """
+    problems = functions.validate_library_zip(input_path)
+    if problems:
+        raise ValueError("; ".join(problems))
+    return f"{input_path} ok"
+
+
+def run_jobs(job, inputs: list, jobs: int = 1) -> int:
+    """
+    Run `job` on every input, in this process if `jobs` is 1 or in a pool of `jobs` worker processes otherwise.
+    Each result is printed as soon as its input is done, errors go to stderr without stopping the other inputs.
+
+    :param job: picklable callable taking a single input path
+    :param inputs: list of input paths
+    :param jobs: number of worker processes
+    :return: number of inputs that failed
+    """
+    failed = 0
+    if jobs > 1 and len(inputs) > 1:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(inputs))) as executor:
+            futures = {executor.submit(job, input_path): input_path for input_path in inputs}
+            for future in as_completed(futures):
+                failed += not _report(futures[future], future.result)
+    else:
+        for input_path in inputs:
+            failed += not _report(input_path, partial(job, input_path))
+    return failed
+
+
+def _report(input_path: Path, call) -> bool:
+    """
+    Run `call` and print its result, or the error it raised, for `input_path`.
+
+    :return: True if `call` succeeded
+    """
+    try:
+        result = call()
+    except Exception as e:
+        print(f"{input_path}: {e}", file=sys.stderr, flush=True)
+        return False
+    print(result, flush=True)
+    return True
+
+
+def _add_build_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--root", type=Path, required=True, help="folder where the runs folder is created")
+    parser.add_argument("--text-key", default="text", help="field of each record containing the text")
+    parser.add_argument("--id-key", default=None, help="field of each record used as file name (default: json key)")
+    parser.add_argument("--label-key", default=None, help="field of each record containing the category")
+    parser.add_argument("--publish", type=Path, default=None, dest="publish_path",
+                        help="folder where the finished libraries are published")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="platform-utils",
+                                     description="Create annotated libraries to be uploaded on EAI Platform")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of datasets processed in parallel")
+    # --jobs is accepted after the subcommand too; SUPPRESS keeps the subparser from overwriting a value given before it
+    jobs_parser = argparse.ArgumentParser(add_help=False)
+    jobs_parser.add_argument("-j", "--jobs", type=int, default=argparse.SUPPRESS,
+                             help="number of datasets processed in parallel")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", parents=[jobs_parser],
+                                           help="convert csv datasets to json")
+    convert_parser.add_argument("inputs", nargs="+", type=Path)
+    convert_parser.add_argument("--primary-key", required=True, help="column of the csv used as pk")
+    convert_parser.add_argument("-o", "--output-dir", type=Path, default=None,
+                                help="output folder (default: next to each csv)")
+
+    normalize_parser = subparsers.add_parser("normalize", parents=[jobs_parser],
+                                             help="fix the encoding of text files")
+    normalize_parser.add_argument("inputs", nargs="+", type=Path)
+    normalize_parser.add_argument("-o", "--output-dir", type=Path, required=True)
+    normalize_parser.add_argument("--qmark-char", default=" ", help="replacement for �")
+
+    build_tax_parser = subparsers.add_parser("build-tax", parents=[jobs_parser],
+                                             help="build categorization libraries from json datasets")
+    build_tax_parser.add_argument("inputs", nargs="+", type=Path)
+    _add_build_arguments(build_tax_parser)
+
+    validate_parser = subparsers.add_parser("validate", parents=[jobs_parser],
+                                            help="check library zip files")
+    validate_parser.add_argument("inputs", nargs="+", type=Path)
+
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.jobs < 1:
+        print("--jobs must be at least 1", file=sys.stderr)
+        return 2
+
+    if args.command == "convert":
+        job = partial(convert, output_dir=args.output_dir, primary_key=args.primary_key)
+        output_paths = [_convert_output_path(input_path, args.output_dir) for input_path in args.inputs]
+    elif args.command == "normalize":
+        job = partial(normalize, output_dir=args.output_dir, qmark_char=args.qmark_char)
+        output_paths = [_normalize_output_path(input_path, args.output_dir) for input_path in args.inputs]
+    elif args.command == "build-tax":
+        job = partial(build_tax, root_path=args.root, text_key=args.text_key, id_key=args.id_key,
+                      label_key=args.label_key, publish_path=args.publish_path)
+    else:
+        job = validate
+
+    if args.command in ("convert", "normalize"):
+        # inputs with the same name from different folders would overwrite each other's output
+        duplicates = _duplicate_outputs(output_paths)
+        if duplicates:
+            print(f"more than one input would be written to: {', '.join(map(str, duplicates))}", file=sys.stderr)
+            return 2
+
+    failed = run_jobs(job, args.inputs, args.jobs)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,11 +6,11 @@ import os
 import zipfile
 from pathlib import Path
 from typing import Generator, Union
-import splitfolders
 import random
 import shutil
 import json
 import csv
+import uuid
 
 
 # class AnnotationJob:
@@ -69,34 +69,43 @@ def create_annotated_file(folders: dict, filename: Union[str, Path], text: str,
     :param text: Testo da annotare.
     :param annotations: Lista di annotazioni associate al testo.
     :return: Nessun valore di ritorno.
+    :raises FileExistsError: Se nella run esiste già un file con lo stesso nome (es. id duplicato nel dataset).
     """
 
     # categorization
-    tax_count = 1
-    with open(f"{folders['tax_test_folder']}/{filename}.txt", 'w', encoding="utf-8") as file:
+    with open(f"{folders['tax_test_folder']}/{filename}.txt", 'x', encoding="utf-8") as file:
         # print(txt)
         file.write(text)
-    file.close()
 
-    with open(f"{folders['tax_ann_folder']}/{filename}.ann", 'a', encoding="utf-8") as ann:
+    tax_count = 1
+    with open(f"{folders['tax_ann_folder']}/{filename}.ann", 'x', encoding="utf-8") as ann:
         for a in annotations:
             ann.write(f"C{tax_count}		{a}\n")
             tax_count += 1
-    ann.close()
 
 
 def create_folder_structure(root_path: Union[str, Path]) -> dict:
     """
     Creates folder structure to be used by :func:`create_libraries_zip`
 
+    Ogni run ha un nome univoco (timestamp + id casuale) e la sua cartella viene creata in modo esclusivo, quindi più
+    build avviate in parallelo sulla stessa `root_path` non condividono mai la stessa run.
+
     :param root_path: Percorso assoluto dove verrà creata o si trova già la cartella runs contenente le varie run
     :return: dizionario con percorsi delle cartelle tax_test, tax_ann, xtr_test, xtr_ann, tax, xtr + timenow
+    :raises FileExistsError: Se la cartella della run esiste già.
     """
-    timenow = datetime.now().strftime('%d_%m_%y_%H_%M')
-    tax_test_folder = Path(f"{root_path}/runs/run_{timenow}/tax/test")
-    tax_ann_folder = Path(f"{root_path}/runs/run_{timenow}/tax/ann")
-    xtr_test_folder = Path(f"{root_path}/runs/run_{timenow}/xtr/test")
-    xtr_ann_folder = Path(f"{root_path}/runs/run_{timenow}/xtr/ann")
+    timenow = f"{datetime.now().strftime('%d_%m_%y_%H_%M_%S')}_{uuid.uuid4().hex[:8]}"
+    run_folder = Path(f"{root_path}/runs/run_{timenow}")
+
+    run_folder.parent.mkdir(parents=True, exist_ok=True)
+    # exclusive creation: fails instead of silently reusing another build's run
+    run_folder.mkdir()
+
+    tax_test_folder = Path(run_folder / "tax" / "test")
+    tax_ann_folder = Path(run_folder / "tax" / "ann")
+    xtr_test_folder = Path(run_folder / "xtr" / "test")
+    xtr_ann_folder = Path(run_folder / "xtr" / "ann")
 
     tax_test_folder.mkdir(parents=True, exist_ok=True)
     tax_ann_folder.mkdir(parents=True, exist_ok=True)
@@ -140,8 +149,9 @@ def split_folder_no_cat(src_folder, dest_folder1, dest_folder2, split_ratio):
     :return:
     """
     # Get a list of files in the src_folder
-    filenames = [filename for filename in os.listdir(src_folder) if
-                 os.path.isfile(os.path.join(src_folder, filename))]
+    # sorted so that folders with the same file stems (ann and test) are split the same way
+    filenames = sorted(filename for filename in os.listdir(src_folder) if
+                       os.path.isfile(os.path.join(src_folder, filename)))
 
     # Shuffle the list of files
     random.seed(1337)
@@ -257,6 +267,9 @@ def split_tax_library(folders: dict, train_pct: float):
 
     """
 
+    # imported here so that jobs which never split a library don't pay for it
+    import splitfolders
+
     val_pct = 1-train_pct
     tax_ann_folder_empty = not any(folders["tax_ann_folder"].iterdir())
     if not tax_ann_folder_empty:
@@ -296,12 +309,54 @@ def zip_loop(zip_path: Path, ann_list: list, test_list: list, zip_name: str):
    :param zip_name: Nome dell'archivio ZIP.
    :return: Nessun valore di ritorno.
     """
-    with zipfile.ZipFile(f'{zip_path}\\{zip_name}.zip', 'w') as zipObj:
-        for f in ann_list:
-            zipObj.write(f, arcname=f"ann/{zip_name}/test/{f.name}")
-            # zipObj.write(f, arcname=f"test/{train_zip_name}/ann/{f.name}.txt")
-        for f in test_list:
-            zipObj.write(f, arcname=f"test/{zip_name}/test/{f.name}")
+    # the archive is written under a temporary name and renamed only when complete, so a half-written zip is never
+    # visible under its final name
+    zip_file = Path(zip_path) / f"{zip_name}.zip"
+    tmp_zip_file = Path(zip_path) / f".{zip_name}.zip.{uuid.uuid4().hex}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_zip_file, 'w') as zipObj:
+            for f in ann_list:
+                zipObj.write(f, arcname=f"ann/{zip_name}/test/{f.name}")
+                # zipObj.write(f, arcname=f"test/{train_zip_name}/ann/{f.name}.txt")
+            for f in test_list:
+                zipObj.write(f, arcname=f"test/{zip_name}/test/{f.name}")
+        os.replace(tmp_zip_file, zip_file)
+    finally:
+        if tmp_zip_file.exists():
+            tmp_zip_file.unlink()
+
+
+def validate_library_zip(zip_path: Union[str, Path]) -> list:
+    """
+    Controlla che un archivio ZIP creato con :func:`zip_loop` abbia la struttura attesa dalla Platform: ogni file di
+    test `test/{zip_name}/test/{name}.txt` deve avere il corrispondente file di annotazione
+    `ann/{zip_name}/test/{name}.ann` e viceversa.
+
+    :param zip_path: Percorso dell'archivio ZIP da controllare.
+    :return: Lista dei problemi trovati, vuota se l'archivio è valido.
+    """
+    zip_path = Path(zip_path)
+    zip_name = zip_path.stem
+    problems = []
+    ann_names = set()
+    test_names = set()
+
+    with zipfile.ZipFile(zip_path) as zipObj:
+        for name in zipObj.namelist():
+            path = Path(name)
+            if path.parent == Path(f"ann/{zip_name}/test") and path.suffix == ".ann":
+                ann_names.add(path.stem)
+            elif path.parent == Path(f"test/{zip_name}/test") and path.suffix == ".txt":
+                test_names.add(path.stem)
+            else:
+                problems.append(f"unexpected entry {name}")
+
+    for name in sorted(test_names - ann_names):
+        problems.append(f"missing annotation file for {name}.txt")
+    for name in sorted(ann_names - test_names):
+        problems.append(f"missing test file for {name}.ann")
+
+    return problems
 
 
 def create_tax_library_zip(folders: dict):
@@ -343,6 +398,56 @@ def create_xtr_library_zip(folders: dict):
     pass
 
 
+def publish_libraries(folders: dict, publish_path: Union[str, Path]) -> Path:
+    """
+    Pubblica gli archivi ZIP delle librerie di una run nella cartella `publish_path`.
+
+    Gli archivi vengono prima copiati in una cartella di staging dentro `publish_path` e poi la cartella viene
+    rinominata in `run_{timenow}` solo quando la copia è completa. Chi legge `publish_path` vede quindi solo run
+    complete, anche con più build che pubblicano in parallelo.
+
+    :param folders: Dizionario creato con :func:`create_folder_structure`, con le librerie già create.
+    :param publish_path: Cartella in cui pubblicare le librerie.
+    :return: Percorso della cartella pubblicata.
+    :raises FileExistsError: Se la run è già stata pubblicata.
+    :raises FileNotFoundError: Se la run non contiene nessun archivio ZIP.
+    """
+    zip_files = [zip_file for library_folder in (folders["tax_folder"], folders["xtr_folder"])
+                 for zip_file in Path(library_folder).glob("*.zip")]
+    if not zip_files:
+        raise FileNotFoundError(f"no library zip to publish for run_{folders['timenow']}")
+
+    publish_path = Path(publish_path)
+    publish_path.mkdir(parents=True, exist_ok=True)
+    published_folder = publish_path / f"run_{folders['timenow']}"
+
+    staging_folder = publish_path / f".staging_{folders['timenow']}_{uuid.uuid4().hex[:8]}"
+    staging_folder.mkdir()
+    try:
+        for zip_file in zip_files:
+            shutil.copy2(zip_file, staging_folder / zip_file.name)
+
+        # exclusive creation of the target: fails if the run was already published, even as an empty folder,
+        # which os.rename would otherwise silently replace on POSIX
+        published_folder.mkdir()
+        try:
+            try:
+                os.rename(staging_folder, published_folder)
+            except FileExistsError:
+                # Windows does not rename onto an existing folder, not even the empty one created above
+                published_folder.rmdir()
+                os.rename(staging_folder, published_folder)
+        except OSError:
+            if published_folder.is_dir() and not any(published_folder.iterdir()):
+                published_folder.rmdir()
+            raise
+    finally:
+        if staging_folder.exists():
+            shutil.rmtree(staging_folder)
+
+    return published_folder
+
+
 def normalize_fucked_encoding(string: str, qmark_char: str = " ") -> str:
     """
     reference table: https://www.i18nqa.com/debug/utf8-debug.html
@@ -7,6 +7,9 @@ setup(
     description='Collection of functions and utilities to create annotated libraries to be uploaded on EAI Platform',
     author='Simone Martin Marotta',
     install_requires=["split-folders"],
+    entry_points={
+        'console_scripts': ['platform-utils=platform_utils_eai.cli:main'],
+    },
     setup_requires=[],
     tests_require=['pytest'],
     test_suite='tests',
@@ -0,0 +1,91 @@
+import pytest
+from pathlib import Path
+import csv
+import json
+import subprocess
+import sys
+import zipfile
+from platform_utils_eai.cli import build_parser, main
+from platform_utils_eai.functions import validate_library_zip
+
+
+@pytest.fixture
+def csv_paths(tmp_path: Path):
+    """Write two small csv datasets."""
+    csv_paths = []
+    for n in range(2):
+        csv_path = tmp_path / f"dataset_{n}.csv"
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['id', 'text'])
+            writer.writeheader()
+            writer.writerows({'id': str(i), 'text': f'text {i} â€™'} for i in range(10))
+        csv_paths.append(csv_path)
+    yield csv_paths
+
+
+def test_import_does_not_load_splitfolders():
+    code = "import sys, platform_utils_eai.cli; assert 'splitfolders' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_convert_and_build_tax(tmp_path: Path, csv_paths, jobs):
+    assert main(["--jobs", jobs, "convert", "--primary-key", "id", "-o", str(tmp_path / "json"),
+                 *map(str, csv_paths)]) == 0
+    json_paths = sorted((tmp_path / "json").glob("*.json"))
+    assert [p.stem for p in json_paths] == [p.stem for p in csv_paths]
+
+    # --jobs is also accepted after the subcommand
+    assert main(["build-tax", "--jobs", jobs, "--root", str(tmp_path / "root"), "--id-key", "id",
+                 "--publish", str(tmp_path / "published"), *map(str, json_paths)]) == 0
+    published = list((tmp_path / "published").iterdir())
+    assert len(published) == len(json_paths)
+
+    zip_paths = [str(p) for folder in published for p in folder.glob("*.zip")]
+    assert len(zip_paths) == 2 * len(json_paths)
+    assert all(validate_library_zip(p) == [] for p in zip_paths)
+    assert main(["--jobs", jobs, "validate", *zip_paths]) == 0
+
+
+def test_normalize(tmp_path: Path, csv_paths):
+    assert main(["normalize", "-o", str(tmp_path / "out"), str(csv_paths[0])]) == 0
+    with open(tmp_path / "out" / csv_paths[0].name, encoding="utf-8") as f:
+        assert "â€™" not in f.read()
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_failed_input_returns_error(tmp_path: Path, capsys, jobs):
+    assert main(["convert", "--jobs", jobs, "--primary-key", "id", str(tmp_path / "missing_0.csv"),
+                 str(tmp_path / "missing_1.csv")]) == 1
+    err = capsys.readouterr().err
+    # every failed input is reported, not only the first one
+    assert "missing_0.csv" in err and "missing_1.csv" in err
+
+
+@pytest.mark.parametrize("argv", [["-j", "3", "convert", "--primary-key", "id", "x.csv"],
+                                  ["convert", "-j", "3", "--primary-key", "id", "x.csv"]])
+def test_jobs_before_or_after_subcommand(argv):
+    assert build_parser().parse_args(argv).jobs == 3
+
+
+@pytest.mark.parametrize("command", [["convert", "--primary-key", "id"], ["normalize"]])
+def test_same_named_inputs_rejected(tmp_path: Path, csv_paths, command, capsys):
+    (tmp_path / "sub").mkdir()
+    same_named = tmp_path / "sub" / csv_paths[0].name
+    same_named.write_bytes(csv_paths[0].read_bytes())
+
+    assert main([*command, "-o", str(tmp_path / "out"), str(csv_paths[0]), str(same_named)]) == 2
+    assert "more than one input" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
+
+
+def test_validate_reports_mismatched_library(tmp_path: Path, capsys):
+    zip_path = tmp_path / "lib.zip"
+    with zipfile.ZipFile(zip_path, 'w') as zipObj:
+        zipObj.writestr("ann/lib/test/1.ann", "")
+        zipObj.writestr("test/lib/test/1.txt", "text 1")
+        zipObj.writestr("test/lib/test/2.txt", "text 2")
+
+    assert validate_library_zip(zip_path) == ["missing annotation file for 2.txt"]
+    assert main(["validate", str(zip_path)]) == 1
+    assert "missing annotation file for 2.txt" in capsys.readouterr().err
@@ -2,19 +2,18 @@ import pytest
 from pathlib import Path
 import shutil
 import json
-from platform_utils_eai.functions import create_folder_structure, create_tax_library_zip, make_json_from_csv, create_annotated_file
+from platform_utils_eai.functions import create_folder_structure, create_tax_library_zip, make_json_from_csv, \
+    create_annotated_file, publish_libraries, split_folder_no_cat
 import csv
 import os
 
 
 @pytest.fixture
-def root_path():
-    # before test - create resource
-    root_path = Path("./tests/test_root")
+def root_path(tmp_path: Path):
+    # runs get unique names, so they are created under pytest's tmp_path instead of the working copy
+    root_path = tmp_path / "test_root"
     root_path.mkdir(exist_ok=True)
     yield root_path
-    # after test - remove resource
-    # shutil.rmtree(root_path)
 
 
 @pytest.fixture
@@ -91,6 +90,83 @@ def test_create_folder_structure(root_path):
     assert folder_structure["xtr_ann_split_folder"].exists()
     assert folder_structure["xtr_test_split_folder"].exists()
 
+
+def test_create_folder_structure_unique_runs(tmp_path: Path):
+    # runs created in the same minute on the same root must not share a folder
+    runs = [create_folder_structure(tmp_path) for _ in range(5)]
+
+    assert len({run["timenow"] for run in runs}) == len(runs)
+    assert len(list((tmp_path / "runs").iterdir())) == len(runs)
+
+
+def test_create_annotated_file(tmp_path: Path):
+    folders = create_folder_structure(tmp_path)
+    create_annotated_file(folders, "doc", "some text", ["cat_a", "cat_b"])
+    # a duplicate id must not add a second block of annotations to the same document
+    with pytest.raises(FileExistsError):
+        create_annotated_file(folders, "doc", "other text", ["cat_c"])
+
+    with open(folders["tax_ann_folder"] / "doc.ann", encoding="utf-8") as f:
+        assert f.read() == "C1\t\tcat_a\nC2\t\tcat_b\n"
+    with open(folders["tax_test_folder"] / "doc.txt", encoding="utf-8") as f:
+        assert f.read() == "some text"
+
+
+def test_split_folder_no_cat_matches_ann_and_test(tmp_path: Path):
+    folders = create_folder_structure(tmp_path)
+    for i in range(50):
+        create_annotated_file(folders, str(i), f"text {i}", [])
+    split_folders = {}
+    for kind in ("ann", "test"):
+        train, val = tmp_path / kind / "train", tmp_path / kind / "val"
+        train.mkdir(parents=True)
+        val.mkdir(parents=True)
+        split_folder_no_cat(folders[f"tax_{kind}_folder"], train, val, 0.8)
+        split_folders[kind] = ({f.stem for f in train.iterdir()}, {f.stem for f in val.iterdir()})
+
+    # every document ends up in the same split for both its .ann and its .txt file
+    assert split_folders["ann"] == split_folders["test"]
+    assert len(split_folders["ann"][0]) == 40
+
+
+def test_publish_libraries(tmp_path: Path):
+    folders = create_folder_structure(tmp_path / "root")
+    for i in range(10):
+        create_annotated_file(folders, str(i), f"text {i}", [])
+    create_tax_library_zip(folders)
+
+    published_folder = publish_libraries(folders, tmp_path / "published")
+
+    assert published_folder == tmp_path / "published" / f"run_{folders['timenow']}"
+    assert sorted(f.name for f in published_folder.iterdir()) == sorted(
+        f.name for f in folders["tax_folder"].glob("*.zip"))
+    # no staging leftovers
+    assert [f.name for f in (tmp_path / "published").iterdir()] == [published_folder.name]
+
+    with pytest.raises(FileExistsError):
+        publish_libraries(folders, tmp_path / "published")
+
+
+def test_publish_libraries_existing_empty_folder(tmp_path: Path):
+    folders = create_folder_structure(tmp_path / "root")
+    for i in range(10):
+        create_annotated_file(folders, str(i), f"text {i}", [])
+    create_tax_library_zip(folders)
+    (tmp_path / "published" / f"run_{folders['timenow']}").mkdir(parents=True)
+
+    with pytest.raises(FileExistsError):
+        publish_libraries(folders, tmp_path / "published")
+    # the existing folder is left untouched and no staging or claim folder is left behind
+    assert [f.name for f in (tmp_path / "published").iterdir()] == [f"run_{folders['timenow']}"]
+
+
+def test_publish_libraries_no_zip(tmp_path: Path):
+    folders = create_folder_structure(tmp_path / "root")
+
+    with pytest.raises(FileNotFoundError):
+        publish_libraries(folders, tmp_path / "published")
+    assert not (tmp_path / "published").exists()
+
 # @pytest.mark.skip
 def test_create_annotated_file_no_annotations(root_path, csv_path, json_path):
     folders = create_folder_structure(root_path)